@@ -1,6 +1,8 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
+import numpy as np
+import json
+import time
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import sys
@@ -14,7 +16,7 @@ try:
     from utils.design_system import (
         inject_custom_css, create_page_header, create_metric_card, 
         create_info_box, get_snowflake_session, create_metric_grid,
-        create_sidebar_navigation, add_page_footer, execute_query_with_loading,
+        create_sidebar_navigation, add_page_footer, get_customers_cached, CUSTOMERS_TTL,
         create_section_header, create_status_indicator, create_professional_metric_charts,
         create_ai_insights_card, create_ai_loading_spinner, create_ai_recommendation_list,
         create_ai_metrics_dashboard, format_ai_response, create_ai_metric_card
@@ -24,7 +26,7 @@ except ImportError:
     from utils.design_system import (
         inject_custom_css, create_page_header, create_metric_card, 
         create_info_box, get_snowflake_session, create_metric_grid,
-        create_sidebar_navigation, add_page_footer, execute_query_with_loading,
+        create_sidebar_navigation, add_page_footer, get_customers_cached, CUSTOMERS_TTL,
         create_section_header, create_status_indicator, create_professional_metric_charts
     )
     # Define fallback AI functions
@@ -108,12 +110,57 @@ st.set_page_config(
 inject_custom_css()
 # create_sidebar_navigation()  # Removed: Logo not needed in sidebar
 
-# Initialize Snowflake session and AI components
-session = get_snowflake_session()
+# Churn risk lookup: (score, color, icon) per level, picked by sentiment band
+# (< -0.5, < 0, >= 0) and ticket band (<= 1, 2, > 2)
+RISK_LEVELS = (
+    (85, "error", ""),
+    (45, "warning", ""),
+    (15, "success", "")
+)
+SENTIMENT_BANDS = np.array([-0.5, 0.0])
+TICKET_BANDS = np.array([1, 2])
+RISK_TABLE = (
+    (1, 1, 0),  # very negative sentiment: high risk only with more than 2 tickets
+    (1, 1, 1),  # negative sentiment: always medium
+    (2, 1, 1)   # neutral/positive sentiment: medium once there is more than 1 ticket
+)
+
+# Initialize Snowflake session and AI components - the session is resolved once per
+# process rather than on every rerun
+@st.cache_resource
+def init_session():
+    return get_snowflake_session()
+
+session = init_session()
 ai_analytics = get_ai_analytics(session)
 ai_processor = get_ai_processor(session)
 customer_cache = get_customer_profile_cache(session)
 
+# Cortex calls are memoized per prompt - the same customer context produces the same
+# answer, so repeat clicks and reruns skip the LLM round trip
+@st.cache_data(ttl=3600, show_spinner=False)
+def cached_ai_complete(prompt, max_tokens):
+    """Run AI_COMPLETE once per (prompt, max_tokens) and reuse the answer across reruns"""
+    response = ai_processor.ai_complete(prompt, max_tokens=max_tokens)
+    if not response:
+        # Raise so an empty/failed completion is never cached
+        raise RuntimeError("AI returned an empty response")
+    return response
+
+def parse_ticket_classification(response, categories, levels):
+    """Read {"category", "urgency"} from a model reply, falling back to a label scan of the raw text"""
+    try:
+        parsed = json.loads(response[response.index('{'):response.rindex('}') + 1])
+        category, urgency = parsed.get('category'), parsed.get('urgency')
+    except (ValueError, AttributeError):
+        category = urgency = None
+    lowered = response.lower()
+    if category not in categories:
+        category = next((c for c in categories if c.lower() in lowered), 'Unknown')
+    if urgency not in levels:
+        urgency = next((u for u in levels if u.lower() in lowered), 'Unknown')
+    return category, urgency
+
 # Professional page header with AI emphasis
 create_page_header(
     title="AI-Powered Customer Intelligence",
@@ -121,20 +168,146 @@ create_page_header(
     icon=""
 )
 
-# Load customer data with professional loading
-customers_data = execute_query_with_loading("""
-SELECT DISTINCT 
-    CELL_ID as customer_id,
-    CUSTOMER_NAME as first_name,
-    '' as last_name,
-    CUSTOMER_EMAIL as email,
-    'Mobile' as service_type,
-    'Active' as account_status,
-    'Premium' as customer_segment
-FROM TELCO_NETWORK_OPTIMIZATION_PROD.RAW.SUPPORT_TICKETS
-WHERE CUSTOMER_NAME IS NOT NULL
-LIMIT 50
-""", "Loading customer data...")
+TICKET_COLUMNS = ['TICKET_ID', 'SERVICE_TYPE', 'DESCRIPTION', 'SENTIMENT_SCORE', 'CONTACT_PREFERENCE']
+TOWER_COLUMNS = ['CELL_ID', 'LOCATION', 'FAILURE_RATE', 'TOTAL_CALLS']
+
+# Cached data loaders - reruns and revisits to a customer reuse the last result
+# instead of going back to Snowflake; the customer list itself comes from
+# get_customers_cached, shared across pages
+
+@st.cache_data(ttl=CUSTOMERS_TTL, show_spinner="Loading support history and network data...")
+def load_customer_frames(customer_id):
+    """
+    The customer's 10 most recent tickets and their cell tower summary in one round trip
+
+    The tower CTE aggregates to one row per cell, so joining it onto the ticket rows
+    adds columns without repeating tickets; every listed customer has at least one
+    ticket, so the tower values are split back out of those rows here.
+
+    Returns:
+        (tickets, tower) DataFrames; tower is empty when the cell has no tower data
+    """
+    rows = session.sql("""
+    WITH tickets AS (
+        SELECT 
+            TICKET_ID,
+            SERVICE_TYPE,
+            -- The page shows at most 500 characters; the extra one lets it still
+            -- tell a truncated description apart
+            SUBSTR(REQUEST, 1, 501) as description,
+            SENTIMENT_SCORE,
+            CONTACT_PREFERENCE
+        FROM TELCO_NETWORK_OPTIMIZATION_PROD.RAW.SUPPORT_TICKETS
+        WHERE CELL_ID = ?
+        ORDER BY TICKET_ID DESC
+        LIMIT 10
+    ),
+    tower AS (
+        SELECT 
+            cell_id,
+            -- Display-ready coordinates; two decimals kept (12.30, not 12.3) via NUMBER(9, 2)
+            TO_VARCHAR(ROUND(AVG(cell_latitude), 2)::NUMBER(9, 2)) || ', ' || TO_VARCHAR(ROUND(AVG(cell_longitude), 2)::NUMBER(9, 2)) as location,
+            ROUND((SUM(CASE WHEN call_release_code != 0 THEN 1 ELSE 0 END) * 100.0 / COUNT(*)), 2) AS failure_rate,
+            COUNT(*) as total_calls
+        FROM TELCO_NETWORK_OPTIMIZATION_PROD.RAW.CELL_TOWER
+        WHERE cell_id = ?
+        GROUP BY cell_id
+    )
+    SELECT tickets.*, tower.*
+    FROM tickets
+    LEFT JOIN tower ON TRUE
+    ORDER BY tickets.TICKET_ID DESC
+    """, params=[customer_id, customer_id]).to_pandas()
+    
+    tickets = rows[TICKET_COLUMNS].copy()
+    # Compact dtypes once here so the cached copy handed to each rerun is smaller
+    tickets['SENTIMENT_SCORE'] = pd.to_numeric(tickets['SENTIMENT_SCORE'], downcast='float')
+    tickets[['SERVICE_TYPE', 'CONTACT_PREFERENCE']] = tickets[['SERVICE_TYPE', 'CONTACT_PREFERENCE']].astype('category')
+    tower = rows.loc[rows['CELL_ID'].notna(), TOWER_COLUMNS].head(1).reset_index(drop=True)
+    return tickets, tower
+
+def load_or_empty(loader, *args):
+    """Call a cached loader; failures are reported and never cached"""
+    try:
+        return loader(*args)
+    except Exception as e:
+        create_info_box(f"Error executing query: {str(e)}", "error")
+        return pd.DataFrame()
+
+@st.cache_data
+def build_sentiment_fig(scores):
+    """Sentiment trend line over a customer's tickets, rebuilt only when the scores change"""
+    sentiment_df = pd.DataFrame({'SENTIMENT_SCORE': scores})
+    fig = create_professional_metric_charts(
+        sentiment_df, 
+        sentiment_df.index, 
+        'SENTIMENT_SCORE',
+        chart_type="line",
+        title="Sentiment Trend Over Time"
+    )
+    fig.add_hline(y=0, line_dash="dash", line_color="gray", annotation_text="Neutral")
+    fig.update_layout(
+        xaxis_title="Interaction Number",
+        yaxis_title="Sentiment Score",
+        height=300
+    )
+    return fig
+
+@st.cache_data
+def build_risk_chart(risk_factors):
+    """Churn risk-factor bars from (name, score) pairs, rebuilt only when the scores change"""
+    # Four fixed bars, so build the trace directly rather than going through
+    # plotly.express's DataFrame path
+    names = [name for name, _ in risk_factors]
+    values = [value for _, value in risk_factors]
+    fig = go.Figure(go.Bar(x=names, y=values, marker=dict(color=values, colorscale='Reds')))
+    fig.update_layout(
+        title="AI-Identified Churn Risk Factors",
+        xaxis_title='Risk Factor',
+        yaxis_title='Risk Score',
+        showlegend=False,
+        height=400
+    )
+    return fig
+
+@st.cache_data
+def compute_recommendations(ticket_count, avg_sentiment, service_type, risk_score):
+    """Sales opportunities and (action, severity) pairs for a customer's metrics"""
+    opportunities = []
+
+    if ticket_count == 0:
+        opportunities.append(" **Excellent Customer**: No support issues - potential for upselling premium services")
+    elif ticket_count == 1 and avg_sentiment > -0.2:
+        opportunities.append(" **Satisfied Customer**: Single resolved issue - good candidate for service expansion")
+
+    if avg_sentiment > 0.3:
+        opportunities.append(" **Happy Customer**: Positive sentiment - ideal for referral program")
+
+    if service_type == 'Mobile':
+        opportunities.append(" **Bundle Opportunity**: Mobile customer - consider internet/TV bundle")
+    elif service_type == 'Internet':
+        opportunities.append(" **Mobile Addition**: Internet customer - mobile service opportunity")
+
+    actions = []
+
+    if risk_score > 70:
+        actions.append((" **HIGH PRIORITY**: Customer at high risk of churn - schedule retention call", "error"))
+    elif risk_score > 40:
+        actions.append(("️ **MEDIUM PRIORITY**: Customer showing churn signals - proactive outreach recommended", "warning"))
+
+    if ticket_count > 2:
+        actions.append((" **Follow-up**: Customer has multiple support tickets - check satisfaction", "warning"))
+
+    if avg_sentiment < -0.5:
+        actions.append((" **Satisfaction**: Poor sentiment scores - investigate and address concerns", "error"))
+
+    if avg_sentiment > 0.3 and ticket_count <= 1:
+        actions.append((" **Upsell Opportunity**: Satisfied customer - schedule consultation for additional services", "success"))
+    
+    return opportunities, actions
+
+# Load customer data
+customers_data = load_or_empty(get_customers_cached)
 
 if customers_data.empty:
     create_info_box("No customer data available. Please ensure the database tables are properly configured.", "error")
@@ -142,83 +315,68 @@ if customers_data.empty:
 
 # Customer selection with professional styling
 st.markdown("###  Select Customer")
-customer_options = customers_data.apply(
-    lambda x: f"{x['CUSTOMER_ID']} - {x['FIRST_NAME']} ({x['EMAIL']})", 
-    axis=1
+customer_options = (
+    customers_data['CUSTOMER_ID'].astype(str) + ' - ' +
+    customers_data['FIRST_NAME'].astype(str) + ' (' +
+    customers_data['EMAIL'].astype(str) + ')'
 ).tolist()
 
+# Reopen on the customer viewed last in this session when returning to the page
+last_selected = st.session_state.get('profile_selected_customer')
 selected_customer = st.selectbox(
     "Choose a customer to analyze:",
     customer_options,
+    index=customer_options.index(last_selected) if last_selected in customer_options else 0,
     help="Select a customer from the dropdown to view their detailed profile"
 )
+st.session_state['profile_selected_customer'] = selected_customer
 customer_id = selected_customer.split(' - ')[0]
 
-# Get customer data with error handling
-customer_filtered = customers_data[customers_data['CUSTOMER_ID'].astype(str) == str(customer_id)]
-
-if customer_filtered.empty:
-    create_info_box(f"Customer ID {customer_id} not found in the dataset.", "error")
-    st.stop()
-
-customer = customer_filtered.iloc[0]
-
-# Helper function for safe customer data access
-def get_customer_field(field, default="N/A"):
-    """Safely get customer field with default value"""
+# Options were built row-for-row from customers_data, so the option's position is the row
+customer = customers_data.iloc[customer_options.index(selected_customer)]
+
+# Materialize the selected customer's display fields once
+customer_info = customer.to_dict()
+customer_id_display = customer_info['CUSTOMER_ID']
+first_name = customer_info.get('FIRST_NAME') or 'Unknown'
+last_name = customer_info.get('LAST_NAME') or ''
+email = customer_info.get('EMAIL') or 'N/A'
+service_type = customer_info.get('SERVICE_TYPE') or 'N/A'
+segment = customer_info.get('CUSTOMER_SEGMENT') or 'N/A'
+account_status = customer_info.get('ACCOUNT_STATUS') or 'Unknown'
+
+# Load customer tickets and tower data. Reruns for the same customer (buttons, tab
+# widgets) reuse the frames held in session state until they are older than
+# CUSTOMERS_TTL - the same age at which the customer list and its ticket aggregates
+# refresh, so the two stay in step; keys are page-prefixed because session state is
+# shared by every page
+if (
+    st.session_state.get('profile_customer_id') != customer_id
+    or time.time() - st.session_state.get('profile_loaded_at', 0) > CUSTOMERS_TTL
+):
     try:
-        if hasattr(customer, 'get'):
-            # DataFrame or dict-like object
-            return customer.get(field, default)
-        elif hasattr(customer, field):
-            # pandas Series with attribute access
-            value = getattr(customer, field, default)
-            return value if pd.notna(value) else default
-        else:
-            # Try index access
-            value = customer[field]
-            return value if pd.notna(value) else default
-    except (KeyError, TypeError, AttributeError, IndexError):
-        return default
-
-# Load customer tickets
-customer_tickets = execute_query_with_loading(f"""
-SELECT 
-    TICKET_ID,
-    CELL_ID as customer_id,
-    CUSTOMER_NAME,
-    CUSTOMER_EMAIL,
-    SERVICE_TYPE,
-    REQUEST as description,
-    SENTIMENT_SCORE,
-    CONTACT_PREFERENCE
-FROM TELCO_NETWORK_OPTIMIZATION_PROD.RAW.SUPPORT_TICKETS
-WHERE CELL_ID = '{customer_id}'
-""", f"Loading support history for customer {get_customer_field('FIRST_NAME', 'Unknown')}...")
-
-# Calculate customer metrics with error handling
-ticket_count = len(customer_tickets) if not customer_tickets.empty else 0
-avg_sentiment = 0
-
-if not customer_tickets.empty and 'SENTIMENT_SCORE' in customer_tickets.columns:
-    sentiment_values = customer_tickets['SENTIMENT_SCORE'].dropna()
-    avg_sentiment = sentiment_values.mean() if not sentiment_values.empty else 0
-elif ticket_count == 0:
-    avg_sentiment = 0
+        st.session_state['profile_tickets'], st.session_state['profile_tower'] = load_customer_frames(customer_id)
+        st.session_state['profile_customer_id'] = customer_id
+        st.session_state['profile_loaded_at'] = time.time()
+    except Exception as e:
+        # Not remembered, so the next rerun retries the queries
+        create_info_box(f"Error executing query: {str(e)}", "error")
+        st.session_state['profile_tickets'] = pd.DataFrame()
+        st.session_state['profile_tower'] = pd.DataFrame()
+        st.session_state.pop('profile_customer_id', None)
+
+customer_tickets = st.session_state['profile_tickets']
+
+# Customer metrics were aggregated in Snowflake along with the customer list, so
+# switching customers needs no extra query for them
+ticket_count = int(customer['TICKET_COUNT'])
+avg_sentiment = float(customer['AVG_SENTIMENT']) if pd.notna(customer['AVG_SENTIMENT']) else 0
+has_service_issue = bool(customer['HAS_SERVICE_ISSUE'])
 
 # Determine churn risk and satisfaction
-if avg_sentiment < -0.5 and ticket_count > 2:
-    risk_score = 85
-    risk_color = "error"
-    risk_icon = ""
-elif avg_sentiment < 0 or ticket_count > 1:
-    risk_score = 45
-    risk_color = "warning" 
-    risk_icon = ""
-else:
-    risk_score = 15
-    risk_color = "success"
-    risk_icon = ""
+sentiment_band = int(np.searchsorted(SENTIMENT_BANDS, avg_sentiment, side='right'))
+ticket_band = int(np.searchsorted(TICKET_BANDS, ticket_count))
+risk_score, risk_color, risk_icon = RISK_LEVELS[RISK_TABLE[sentiment_band][ticket_band]]
 
 satisfaction = min(5, max(1, (avg_sentiment + 1) * 2.5)) if pd.notna(avg_sentiment) else 3
 
@@ -246,7 +404,7 @@ with ai_tab1:
         if cached_insights:
             customer_cache.display_cache_indicator(cached_insights)
             create_ai_insights_card(
-                f"Customer Analysis: {get_customer_field('FIRST_NAME', 'Unknown')}", 
+                f"Customer Analysis: {first_name}", 
                 cached_insights['content'], 
                 confidence=cached_insights.get('confidence', 0.82), 
                 icon=""
@@ -263,10 +421,10 @@ with ai_tab1:
                 customer_context = f"""
                 Customer Profile Analysis:
                 - Customer ID: {customer_id}
-                - Name: {get_customer_field('FIRST_NAME', 'Unknown')}
-                - Email: {get_customer_field('EMAIL', 'Unknown')}
-                - Service Type: {get_customer_field('SERVICE_TYPE', 'Unknown')}
-                - Account Status: {get_customer_field('ACCOUNT_STATUS', 'Unknown')}
+                - Name: {first_name}
+                - Email: {email}
+                - Service Type: {service_type}
+                - Account Status: {account_status}
                 - Support Tickets: {ticket_count} tickets
                 - Average Sentiment: {avg_sentiment:.3f}
                 - Current Risk Score: {risk_score}%
@@ -274,13 +432,15 @@ with ai_tab1:
                 Recent Support Issues:
                 """
                 
-                # Add recent ticket details if available
+                # Add recent ticket details if available - joined once rather than grown with +=
                 if not customer_tickets.empty:
-                    for _, ticket in customer_tickets.head(3).iterrows():
-                        customer_context += f"- {ticket.get('SERVICE_TYPE', 'Unknown')}: {ticket.get('DESCRIPTION', 'No description')[:100]}... (Sentiment: {ticket.get('SENTIMENT_SCORE', 0):.2f})\n"
+                    customer_context = customer_context + "".join(
+                        f"- {ticket.SERVICE_TYPE}: {(ticket.DESCRIPTION or 'No description')[:100]}... (Sentiment: {ticket.SENTIMENT_SCORE:.2f})\n"
+                        for ticket in customer_tickets.head(3).itertuples(index=False)
+                    )
                 
                 # Generate AI insights
-                ai_insights = ai_processor.ai_complete(
+                ai_insights = cached_ai_complete(
                     f"""Analyze this telecom customer profile and provide comprehensive insights:
                     
                     {customer_context}
@@ -293,7 +453,7 @@ with ai_tab1:
                     5. Recommended next actions
                     
                     Be specific and actionable in your analysis.""",
-                    max_tokens=600
+                    600
                 )
                 
                 if ai_insights:
@@ -311,7 +471,7 @@ with ai_tab1:
                     )
                     
                     create_ai_insights_card(
-                        f"Customer Analysis: {get_customer_field('FIRST_NAME', 'Unknown')}", 
+                        f"Customer Analysis: {first_name}", 
                         ai_insights, 
                         confidence=0.82, 
                         icon=""
@@ -329,8 +489,14 @@ with ai_tab1:
                         issue_categories = ["Network Quality", "Billing Issue", "Service Outage", "Technical Support", "Account Management", "Hardware Problem"]
                         urgency_levels = ["Critical", "High", "Medium", "Low"]
                         
-                        issue_category = ai_processor.ai_classify(ticket_text, issue_categories)
-                        urgency_level = ai_processor.ai_classify(ticket_text, urgency_levels)
+                        # One completion returns both labels instead of two AI_CLASSIFY round trips
+                        classification = cached_ai_complete(
+                            f"Classify this telecom support ticket. Return only JSON with keys 'category' (one of {issue_categories}) and 'urgency' (one of {urgency_levels}): {ticket_text}",
+                            60
+                        )
+                        issue_category, urgency_level = parse_ticket_classification(
+                            classification, issue_categories, urgency_levels
+                        )
                         
                         ai_metrics = {
                             "Issue Category": issue_category,
@@ -350,35 +516,24 @@ with ai_tab1:
         
         if ticket_count > 0:
             # Generate a quick customer summary
-            quick_summary = ai_processor.ai_complete(
-                f"Summarize telecom customer in EXACTLY 100 words: {ticket_count} tickets, sentiment {avg_sentiment:.2f}, {risk_score}% churn risk. Include status and actions.",
-                max_tokens=150
-            )
+            try:
+                quick_summary = cached_ai_complete(
+                    f"Summarize telecom customer in EXACTLY 100 words: {ticket_count} tickets, sentiment {avg_sentiment:.2f}, {risk_score}% churn risk. Include status and actions.",
+                    150
+                )
+            except Exception:
+                quick_summary = None
             
             if quick_summary:
                 # Fix formatting: replace \n with actual line breaks and display as normal text
                 formatted_summary = quick_summary.replace('\\n', '\n') if '\\n' in quick_summary else quick_summary
                 
-                st.markdown(f"""
-                <div style="background: white; padding: 1.5rem; border-radius: 12px; box-shadow: 0 4px 20px rgba(0,0,0,0.08); border-left: 4px solid #1f4e79;">
-                    <h4 style="color: #1f4e79; margin: 0 0 1rem 0; font-size: 1rem;">AI Summary</h4>
-                    <div style="color: #495057; font-size: 0.9rem; line-height: 1.6; white-space: pre-wrap;">
-                        {formatted_summary}
-                    </div>
-                    <div style="margin-top: 1rem; padding-top: 1rem; border-top: 1px solid #e9ecef; font-size: 0.85rem; color: #6c757d;">
-                        Risk Level: {risk_icon} {risk_score}%
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
+                with st.container(border=True):
+                    st.markdown("**AI Summary**")
+                    st.markdown(formatted_summary)
+                    st.caption(f"Risk Level: {risk_icon} {risk_score}%")
         else:
-            st.markdown("""
-            <div style="background: white; padding: 1.5rem; border-radius: 12px; box-shadow: 0 4px 20px rgba(0,0,0,0.08); border-left: 4px solid #28a745;">
-                <h4 style="color: #28a745; margin: 0 0 1rem 0; font-size: 1rem;">Customer Status</h4>
-                <div style="color: #495057; font-size: 0.9rem; line-height: 1.6;">
-                    New Customer - No support history available for AI analysis
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
+            st.success("**Customer Status:** New Customer - No support history available for AI analysis")
 
 with ai_tab2:
     st.markdown("###  AI Churn Prediction Model")
@@ -428,7 +583,7 @@ with ai_tab2:
             Customer Metrics:
             - Support Tickets: {ticket_count}
             - Average Sentiment: {avg_sentiment:.3f} 
-            - Service Type: {get_customer_field('SERVICE_TYPE', 'Unknown')}
+            - Service Type: {service_type}
             - Account Duration: Active customer
             - Contact Preferences: {customer_tickets['CONTACT_PREFERENCE'].iloc[0] if not customer_tickets.empty else 'Unknown'}
             
@@ -438,7 +593,7 @@ with ai_tab2:
             - Service issues: {'Multiple' if ticket_count > 2 else 'Few' if ticket_count > 0 else 'None'}
             """
             
-            churn_prediction = ai_processor.ai_complete(
+            churn_prediction = cached_ai_complete(
                 f"""As an expert in telecom customer retention, analyze this customer's churn risk:
                 
                 {churn_context}
@@ -451,7 +606,7 @@ with ai_tab2:
                 5. Confidence level in the prediction
                 
                 Be specific about the factors that contribute to churn risk.""",
-                max_tokens=500
+                500
             )
             
             if churn_prediction:
@@ -491,30 +646,29 @@ with ai_tab2:
         except Exception as e:
             st.error(f"Error in churn analysis: {e}")
     
-    # Churn risk factors visualization  
+    # Churn risk factors visualization - the figure is only built once the user asks for
+    # it, so reruns driven by the other tabs skip it until then; the flag holds the
+    # customer it was requested for, so picking another customer hides it again
+    show_churn_chart = st.session_state.get("profile_show_churn_chart") == customer_id
     if not customer_tickets.empty:
         st.markdown("####  Risk Factor Analysis")
         
+        if not show_churn_chart and st.button("Show risk factors", key="show_risk_factors"):
+            st.session_state["profile_show_churn_chart"] = customer_id
+            show_churn_chart = True
+    
+    if not customer_tickets.empty and show_churn_chart:
         # Calculate risk factors
         risk_factors = {
             "Negative Sentiment": max(0, (-avg_sentiment * 50)) if avg_sentiment < 0 else 0,
             "High Ticket Volume": min(ticket_count * 15, 60),
-            "Service Issues": 40 if any('outage' in str(desc).lower() or 'problem' in str(desc).lower() 
-                                    for desc in customer_tickets['DESCRIPTION']) else 0,
-            "Contact Frequency": min(len(customer_tickets) * 10, 50)
+            "Service Issues": 40 if has_service_issue else 0,
+            "Contact Frequency": min(ticket_count * 10, 50)
         }
         
         # Create bar chart of risk factors
-        fig = px.bar(
-            x=list(risk_factors.keys()),
-            y=list(risk_factors.values()),
-            title="AI-Identified Churn Risk Factors",
-            labels={'x': 'Risk Factor', 'y': 'Risk Score'},
-            color=list(risk_factors.values()),
-            color_continuous_scale='Reds'
-        )
-        fig.update_layout(showlegend=False, height=400)
-        st.plotly_chart(fig, use_container_width=True)
+        fig = build_risk_chart(tuple(risk_factors.items()))
+        st.plotly_chart(fig, use_container_width=True, key=f"risk_{customer_id}")
 
 with ai_tab3:
     st.markdown("###  AI-Powered Recommendations")
@@ -538,7 +692,7 @@ with ai_tab3:
     if cached_recommendations:
         customer_cache.display_cache_indicator(cached_recommendations)
         create_ai_insights_card(
-            f" {recommendation_type} for {get_customer_field('FIRST_NAME', 'Unknown')}", 
+            f" {recommendation_type} for {first_name}", 
             cached_recommendations['content'], 
             confidence=cached_recommendations.get('confidence', 0.88), 
             icon=""
@@ -553,16 +707,16 @@ with ai_tab3:
         try:
             # Create personalized recommendation context
             rec_context = f"""
-            Customer: {get_customer_field('FIRST_NAME', 'Unknown')} (ID: {customer_id})
+            Customer: {first_name} (ID: {customer_id})
             Risk Level: {risk_score}% churn risk
-            Service Type: {get_customer_field('SERVICE_TYPE', 'Unknown')}
+            Service Type: {service_type}
             Support History: {ticket_count} tickets, avg sentiment {avg_sentiment:.2f}
-            Account Status: {get_customer_field('ACCOUNT_STATUS', 'Active')}
+            Account Status: {account_status}
             
             Recent Issues: {customer_tickets['DESCRIPTION'].iloc[0][:200] if not customer_tickets.empty else 'No recent issues'}
             """
             
-            recommendations = ai_processor.ai_complete(
+            recommendations = cached_ai_complete(
                 f"""As a telecom customer success expert, provide specific {recommendation_type.lower()} for this customer:
                 
                 {rec_context}
@@ -575,7 +729,7 @@ with ai_tab3:
                 5. Have measurable outcomes
                 
                 Format as specific, numbered action items.""",
-                max_tokens=600
+                600
             )
             
             if recommendations:
@@ -594,7 +748,7 @@ with ai_tab3:
                 )
                 
                 create_ai_insights_card(
-                    f" {recommendation_type} for {get_customer_field('FIRST_NAME', 'Unknown')}", 
+                    f" {recommendation_type} for {first_name}", 
                     recommendations, 
                     confidence=0.88, 
                     icon=""
@@ -622,64 +776,23 @@ create_section_header("Customer Overview", "")
 col1, col2 = st.columns([2, 1])
 
 with col1:
-    # Safe field access for display
-    first_name = get_customer_field('FIRST_NAME', 'Unknown')
-    last_name = get_customer_field('LAST_NAME', '')
-    customer_id_display = get_customer_field('CUSTOMER_ID', 'N/A')
-    email = get_customer_field('EMAIL', 'N/A')
-    service_type = get_customer_field('SERVICE_TYPE', 'N/A')
-    segment = get_customer_field('CUSTOMER_SEGMENT', 'N/A')
-    status = get_customer_field('ACCOUNT_STATUS', 'Unknown')
-    
-    # Customer header
-    st.markdown(f"""
-    <div style="background: white; padding: 2rem; border-radius: 12px; box-shadow: 0 4px 20px rgba(0,0,0,0.08); border-left: 4px solid #1f4e79;">
-        <h2 style="color: #1f4e79; margin: 0 0 1.5rem 0;">{first_name} {last_name}</h2>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    # Customer details using Streamlit columns for better reliability
-    st.markdown("**Customer Details:**")
-    
-    detail_col1, detail_col2 = st.columns(2)
-    
-    with detail_col1:
-        st.markdown(f"""
-        <div style="background: #f8f9fa; padding: 1rem; border-radius: 8px; margin-bottom: 0.5rem;">
-            <strong style="color: #6c757d;">Customer ID:</strong><br>
-            <span style="font-size: 1.1rem; color: #1f4e79; font-weight: 600;">{customer_id_display}</span>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        st.markdown(f"""
-        <div style="background: #f8f9fa; padding: 1rem; border-radius: 8px; margin-bottom: 0.5rem;">
-            <strong style="color: #6c757d;">Service Type:</strong><br>
-            <span style="font-size: 1.1rem; color: #495057;">{service_type}</span>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with detail_col2:
-        st.markdown(f"""
-        <div style="background: #f8f9fa; padding: 1rem; border-radius: 8px; margin-bottom: 0.5rem;">
-            <strong style="color: #6c757d;">Email:</strong><br>
-            <span style="font-size: 1.1rem; color: #495057;">{email}</span>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        st.markdown(f"""
-        <div style="background: #f8f9fa; padding: 1rem; border-radius: 8px; margin-bottom: 0.5rem;">
-            <strong style="color: #6c757d;">Segment:</strong><br>
-            <span style="font-size: 1.1rem; color: #495057;">{segment}</span>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    # Account status
-    st.markdown(f"""
-    <div style="background: #d4edda; padding: 1rem; border-radius: 8px; border-left: 4px solid #28a745; margin-top: 1rem;">
-        <strong style="color: #155724;">Account Status:</strong> 
-        <span style="margin-left: 0.5rem; font-weight: 600; color: #155724;"> {status}</span>
-    </div>
-    """, unsafe_allow_html=True)
+    # Native containers rather than a hand-styled HTML block, so Streamlit can diff the
+    # widgets across reruns instead of resending the markup
+    with st.container(border=True):
+        st.subheader(f"{first_name} {last_name}")
+        st.markdown("**Customer Details:**")
+        details = [
+            ("Customer ID", customer_id_display),
+            ("Email", email),
+            ("Service Type", service_type),
+            ("Segment", segment)
+        ]
+        detail_cols = st.columns(2)
+        for i, (label, value) in enumerate(details):
+            with detail_cols[i % 2]:
+                st.caption(label)
+                st.markdown(f"**{value}**")
+        st.success(f"**Account Status:** {account_status}")
 
 with col2:
     # Customer metrics cards
@@ -709,25 +822,27 @@ with col2:
 create_section_header("Support History & Analysis", "")
 
 if len(customer_tickets) > 0:
+    # The loader returns the newest tickets first (the AI context and previews read the
+    # head); the table and the trend chart read oldest-to-newest so time runs forward
+    chronological_tickets = customer_tickets.iloc[::-1]
     col1, col2 = st.columns([2, 1])
     
     with col1:
         st.markdown("#### Recent Support Interactions")
         
         # Create a professional table display
-        tickets_display = customer_tickets[['TICKET_ID', 'SERVICE_TYPE', 'SENTIMENT_SCORE', 'CONTACT_PREFERENCE']].copy()
+        tickets_display = chronological_tickets[['TICKET_ID', 'SERVICE_TYPE', 'SENTIMENT_SCORE', 'CONTACT_PREFERENCE']].copy()
         tickets_display.columns = ['Ticket ID', 'Service Type', 'Sentiment Score', 'Contact Preference']
         
-        # Format sentiment scores without HTML (st.dataframe doesn't render HTML)
-        def format_sentiment_simple(score):
-            if score > 0:
-                return f" +{score:.2f}"
-            elif score < -0.3:
-                return f" {score:.2f}"
-            else:
-                return f"️ {score:.2f}"
-        
-        tickets_display['Sentiment Score'] = tickets_display['Sentiment Score'].apply(format_sentiment_simple)
+        # Format sentiment scores without HTML (st.dataframe doesn't render HTML),
+        # picking the positive/negative/neutral label for every row at once
+        scores = tickets_display['Sentiment Score'].to_numpy(dtype=float)
+        score_text = np.char.mod('%.2f', scores)
+        tickets_display['Sentiment Score'] = np.select(
+            [scores > 0, scores < -0.3],
+            [np.char.add(' +', score_text), np.char.add(' ', score_text)],
+            default=np.char.add('️ ', score_text)
+        )
         
         st.markdown("""
         <div style="background: white; padding: 1.5rem; border-radius: 12px; box-shadow: 0 4px 20px rgba(0,0,0,0.08);">
@@ -761,98 +876,62 @@ if len(customer_tickets) > 0:
         
         if len(customer_tickets) > 1:
             # Create sentiment trend chart
-            sentiment_df = customer_tickets.reset_index()
-            fig = create_professional_metric_charts(
-                sentiment_df, 
-                sentiment_df.index, 
-                'SENTIMENT_SCORE',
-                chart_type="line",
-                title="Sentiment Trend Over Time"
-            )
-            fig.add_hline(y=0, line_dash="dash", line_color="gray", annotation_text="Neutral")
-            fig.update_layout(
-                xaxis_title="Interaction Number",
-                yaxis_title="Sentiment Score",
-                height=300
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            fig = build_sentiment_fig(tuple(chronological_tickets['SENTIMENT_SCORE'].tolist()))
+            st.plotly_chart(fig, use_container_width=True, key=f"sentiment_{customer_id}")
         else:
             # Single sentiment display
-            sentiment_color = "#28a745" if avg_sentiment > 0 else "#dc3545" if avg_sentiment < -0.3 else "#ffc107"
-            st.markdown(f"""
-            <div style="background: white; padding: 2rem; border-radius: 12px; box-shadow: 0 4px 20px rgba(0,0,0,0.08); text-align: center;">
-                <div style="font-size: 3rem; margin-bottom: 1rem; color: {sentiment_color};">
-                    {"" if avg_sentiment > 0 else "" if avg_sentiment < -0.3 else ""}
-                </div>
-                <h3 style="margin: 0; color: #1f4e79;">Current Sentiment</h3>
-                <p style="margin: 0.5rem 0 0 0; font-size: 1.5rem; font-weight: 600; color: {sentiment_color};">
-                    {avg_sentiment:.2f}
-                </p>
-            </div>
-            """, unsafe_allow_html=True)
+            with st.container(border=True):
+                st.metric("Current Sentiment", f"{avg_sentiment:.2f}")
     
     # Recent ticket details
     st.markdown("#### Recent Ticket Details")
-    for idx, ticket in customer_tickets.head(3).iterrows():
-        with st.expander(f" Ticket {ticket['TICKET_ID']} - {ticket['SERVICE_TYPE']}"):
+    for ticket in customer_tickets.head(3).itertuples(index=False):
+        with st.expander(f" Ticket {ticket.TICKET_ID} - {ticket.SERVICE_TYPE}"):
             col1, col2 = st.columns([1, 1])
             with col1:
-                st.write(f"**Sentiment Score:** {ticket['SENTIMENT_SCORE']:.2f}")
-                st.write(f"**Contact Preference:** {ticket['CONTACT_PREFERENCE']}")
+                st.write(f"**Sentiment Score:** {ticket.SENTIMENT_SCORE:.2f}")
+                st.write(f"**Contact Preference:** {ticket.CONTACT_PREFERENCE}")
             with col2:
-                sentiment_status = "positive" if ticket['SENTIMENT_SCORE'] > 0 else "negative" if ticket['SENTIMENT_SCORE'] < -0.3 else "neutral"
+                sentiment_status = "positive" if ticket.SENTIMENT_SCORE > 0 else "negative" if ticket.SENTIMENT_SCORE < -0.3 else "neutral"
                 create_status_indicator(sentiment_status, f"Sentiment: {sentiment_status.title()}")
             
             st.markdown("**Description:**")
-            description = str(ticket['DESCRIPTION'])
-            if len(description) > 500:
-                st.write(f"{description[:500]}...")
-            else:
-                st.write(description)
+            description = ticket.DESCRIPTION or ''
+            st.write(description[:500] + ('...' if len(description) > 500 else ''))
 else:
     create_info_box("No support tickets found for this customer.", "info")
 
 # Network Performance Section
 create_section_header("Network Performance", "")
 
-# Load cell tower performance data
-tower_data = execute_query_with_loading(f"""
-SELECT 
-    cell_id,
-    ROUND(cell_latitude, 4) as latitude, 
-    ROUND(cell_longitude, 4) as longitude, 
-    ROUND((SUM(CASE WHEN call_release_code != 0 THEN 1 ELSE 0 END) * 100.0 / COUNT(*)), 2) AS failure_rate,
-    COUNT(*) as total_calls
-FROM TELCO_NETWORK_OPTIMIZATION_PROD.RAW.CELL_TOWER
-WHERE cell_id = '{customer_id}'
-GROUP BY cell_id, cell_latitude, cell_longitude
-""", "Loading network performance data...")
+# Cell tower performance data (loaded with the customer's tickets)
+tower_data = st.session_state['profile_tower']
 
 if not tower_data.empty:
-    tower_info = tower_data.iloc[0]
+    tower_info = next(tower_data.itertuples(index=False))
     
     col1, col2, col3, col4 = st.columns(4)
     
     metrics = [
         {
             "title": "Cell Tower ID",
-            "value": str(tower_info['CELL_ID']),
+            "value": str(tower_info.CELL_ID),
             "delta": "Primary tower"
         },
         {
             "title": "Network Failure Rate",
-            "value": f"{tower_info['FAILURE_RATE']:.1f}%",
+            "value": f"{tower_info.FAILURE_RATE:.1f}%",
             "delta": "Lower is better",
-            "delta_color": "positive" if tower_info['FAILURE_RATE'] < 10 else "negative"
+            "delta_color": "positive" if tower_info.FAILURE_RATE < 10 else "negative"
         },
         {
             "title": "Total Calls",
-            "value": f"{tower_info['TOTAL_CALLS']:,}",
+            "value": f"{tower_info.TOTAL_CALLS:,}",
             "delta": "Call volume"
         },
         {
             "title": "Location",
-            "value": f"{tower_info['LATITUDE']:.2f}, {tower_info['LONGITUDE']:.2f}",
+            "value": tower_info.LOCATION,
             "delta": "Coordinates"
         }
     ]
@@ -864,52 +943,17 @@ else:
 # Sales Opportunities Section
 create_section_header("Sales Opportunities", "")
 
-opportunities = []
-
-# Generate opportunities based on customer data
-if ticket_count == 0:
-    opportunities.append(" **Excellent Customer**: No support issues - potential for upselling premium services")
-elif ticket_count == 1 and avg_sentiment > -0.2:
-    opportunities.append(" **Satisfied Customer**: Single resolved issue - good candidate for service expansion")
-
-if avg_sentiment > 0.3:
-    opportunities.append(" **Happy Customer**: Positive sentiment - ideal for referral program")
-
-service_type = get_customer_field('SERVICE_TYPE', 'Unknown')
-if service_type == 'Mobile':
-    opportunities.append(" **Bundle Opportunity**: Mobile customer - consider internet/TV bundle")
-elif service_type == 'Internet':
-    opportunities.append(" **Mobile Addition**: Internet customer - mobile service opportunity")
+opportunities, actions = compute_recommendations(ticket_count, avg_sentiment, service_type, risk_score)
 
 if opportunities:
-    for i, opp in enumerate(opportunities):
-        st.markdown(f"""
-        <div style="background: white; padding: 1rem; border-radius: 8px; box-shadow: 0 2px 8px rgba(0,0,0,0.05); margin-bottom: 0.5rem; border-left: 4px solid #28a745;">
-            {opp}
-        </div>
-        """, unsafe_allow_html=True)
+    for opp in opportunities:
+        st.success(opp)
 else:
     create_info_box("No immediate sales opportunities identified based on available data.", "info")
 
 # Action Items Section
 create_section_header("Recommended Actions", "")
 
-actions = []
-
-if risk_score > 70:
-    actions.append((" **HIGH PRIORITY**: Customer at high risk of churn - schedule retention call", "error"))
-elif risk_score > 40:
-    actions.append(("️ **MEDIUM PRIORITY**: Customer showing churn signals - proactive outreach recommended", "warning"))
-
-if ticket_count > 2:
-    actions.append((" **Follow-up**: Customer has multiple support tickets - check satisfaction", "warning"))
-
-if avg_sentiment < -0.5:
-    actions.append((" **Satisfaction**: Poor sentiment scores - investigate and address concerns", "error"))
-
-if avg_sentiment > 0.3 and ticket_count <= 1:
-    actions.append((" **Upsell Opportunity**: Satisfied customer - schedule consultation for additional services", "success"))
-
 if actions:
     for action, action_type in actions:
         create_info_box(action, action_type)
@@ -1,7 +1,9 @@
 import streamlit as st
-import pandas as pd
+import numpy as np
+import json
+import concurrent.futures
 import pydeck as pdk
-import matplotlib.pyplot as plt
+import plotly.graph_objects as go
 from snowflake.snowpark.context import get_active_session
 import sys
 import os
@@ -10,7 +12,7 @@ import os
 sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'utils'))
 
 # Import design system components
-from utils.design_system import inject_custom_css, create_page_header
+from utils.design_system import inject_custom_css, create_page_header, submit_in_script_ctx
 
 # Page configuration - must be the first Streamlit command
 st.set_page_config(
@@ -34,42 +36,147 @@ create_page_header(
 session = get_active_session()
 
 # Original networkoptimisation.py logic
-query = """
+# Every map click reruns the script (on_select="rerun"), so the queries are cached and
+# only go back to Snowflake when the inputs change or the TTL expires
+TOWER_QUERY = """
     SELECT
     cell_id,
-    ROUND(cell_latitude, 2) AS cell_latitude, 
-    ROUND(cell_longitude, 2) AS cell_longitude, 
+    ROUND(AVG(cell_latitude), 2) AS cell_latitude, 
+    ROUND(AVG(cell_longitude), 2) AS cell_longitude, 
     SUM(CASE WHEN call_release_code = 0 THEN 1 ELSE 0 END) AS total_success, 
     COUNT(*) AS total_calls, 
     ROUND((SUM(CASE WHEN call_release_code != 0 THEN 1 ELSE 0 END) * 100.0 / COUNT(*)), 2) AS failure_rate, 
     ROUND((SUM(CASE WHEN call_release_code = 0 THEN 1 ELSE 0 END) * 100.0 / COUNT(*)), 2) AS success_rate
 FROM TELCO_NETWORK_OPTIMIZATION_PROD.RAW.CELL_TOWER
-GROUP BY cell_id, cell_latitude, cell_longitude;
+GROUP BY cell_id;
 """
-data = session.sql(query).to_pandas()
 
-# Function to generate color based on failure rate
-def get_color(failure_rate):
-    """Map failure rate to a color"""
-    if failure_rate >= 90:
-        return [255, 0, 0, 160]  # Red
-    elif failure_rate >= 60:
-        return [255, 255, 0, 160]  # Yellow
-    else:
-        return [0, 255, 0, 160]  # Green  
-
-# Apply the color function to create a color column
-data['COLOR'] = data['FAILURE_RATE'].apply(get_color)
+# Failure rate colors: >= 90 red, >= 60 yellow, otherwise green
+FAILURE_COLORS = np.array([
+    [255, 0, 0, 160],    # Red
+    [255, 255, 0, 160],  # Yellow
+    [0, 255, 0, 160]     # Green
+], dtype=np.uint8)
+
+@st.cache_data(ttl=3600, show_spinner="Loading cell tower performance data...")
+def load_tower_data():
+    """Per-tower stats with the failure-rate color already assigned, so reruns reuse it"""
+    data = session.sql(TOWER_QUERY).to_pandas()
+    # Pick every tower's color in one vectorized pass rather than a Python call per row
+    failure_rate = data['FAILURE_RATE'].to_numpy(dtype=float)
+    colors = FAILURE_COLORS[np.select([failure_rate >= 90, failure_rate >= 60], [0, 1], default=2)]
+    data['COLOR'] = colors.tolist()
+    return data
+
+# Selected cell ids are bound as one JSON array parameter, so the SQL text is the same
+# for every selection and Snowflake can reuse the compiled plan
+CELL_IDS_PARAM = "SELECT value FROM TABLE(FLATTEN(input => PARSE_JSON(?)))"
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def load_loyalty_data(cell_ids):
+    """Loyalty tier counts of customers with failed calls, per selected cell"""
+    # Narrow CELL_TOWER to the selected cells' failed calls before joining
+    return session.sql(f"""WITH failed AS (
+        SELECT msisdn, cell_id
+        FROM TELCO_NETWORK_OPTIMIZATION_PROD.RAW.CELL_TOWER
+        WHERE cell_id IN ({CELL_IDS_PARAM})
+            AND call_release_code != 0
+    )
+    SELECT 
+        failed.cell_id,
+        COUNT(CASE WHEN cl.status = 'Bronze' THEN 1 END) AS bronze_count,
+        COUNT(CASE WHEN cl.status = 'Silver' THEN 1 END) AS silver_count,
+        COUNT(CASE WHEN cl.status = 'Gold' THEN 1 END) AS gold_count
+    FROM 
+        failed
+    JOIN 
+        TELCO_NETWORK_OPTIMIZATION_PROD.raw.customer_loyalty cl
+    ON 
+        cl.phone_number = failed.msisdn
+    GROUP BY 
+        failed.cell_id;
+    """, params=[json.dumps(cell_ids, default=str)]).to_pandas()
 
-# Find the average failure rate location
-avg_failure = data.groupby(['CELL_LATITUDE', 'CELL_LONGITUDE']).agg({'FAILURE_RATE': 'mean'}).reset_index()
-highest_avg_failure = avg_failure.loc[avg_failure['FAILURE_RATE'].idxmax()]
+@st.cache_data(ttl=3600, show_spinner=False)
+def load_sentiment_data(cell_ids):
+    """Average support-ticket sentiment per selected cell"""
+    return session.sql(f"""SELECT 
+        cell_id,
+        AVG(sentiment_score) + 20 AS avg_sentiment_score
+    FROM 
+        TELCO_NETWORK_OPTIMIZATION_PROD.RAW.SUPPORT_TICKETS
+    WHERE cell_id IN ({CELL_IDS_PARAM})
+    GROUP BY 
+        cell_id
+    ORDER BY 
+        avg_sentiment_score DESC;
+    """, params=[json.dumps(cell_ids, default=str)]).to_pandas()
+
+@st.cache_data(ttl=86400, show_spinner=False)
+def cortex_complete(model, prompt):
+    """Cortex completion memoized on (model, prompt), so re-selecting the same cells is instant"""
+    return session.sql("select snowflake.cortex.complete(?, ?) as res", params=[model, prompt]).to_pandas()["RES"][0]
+
+@st.cache_resource
+def get_query_executor():
+    """Shared worker pool so a selection's independent Snowflake calls run side by side"""
+    return concurrent.futures.ThreadPoolExecutor(max_workers=3)
+
+# Selection charts are Plotly specs rendered in the browser, cached on their inputs so
+# re-selecting the same cells reuses them instead of rebuilding the figures
+@st.cache_data
+def build_failure_rate_fig(cell_ids, failure_rates):
+    fig = go.Figure(go.Bar(x=[str(c) for c in cell_ids], y=list(failure_rates), marker_color="orange", name="Failure Rate (%)"))
+    fig.update_layout(title="Failure Rate for Each Cell", yaxis_title="Failure Rate (%)", xaxis_title="Cell ID", xaxis_type="category")
+    return fig
+
+@st.cache_data
+def build_loyalty_fig(loyalty_data):
+    fig = go.Figure([
+        go.Bar(x=loyalty_data.index.astype(str), y=loyalty_data[column], name=label, marker_color=color)
+        for column, label, color in (
+            ('BRONZE_COUNT', 'Bronze', '#cd7f32'),
+            ('SILVER_COUNT', 'Silver', '#c0c0c0'),
+            ('GOLD_COUNT', 'Gold', '#ffd700')
+        )
+    ])
+    fig.update_layout(
+        barmode="stack",
+        title="Loyalty Status Count by Cell",
+        xaxis_title="Cell ID",
+        yaxis_title="Customer Count",
+        xaxis_type="category",
+        xaxis_tickangle=-45,
+        legend_title_text="Loyalty Status"
+    )
+    return fig
+
+@st.cache_data
+def build_sentiment_fig(sentiment_score):
+    fig = go.Figure(go.Bar(x=sentiment_score['CELL_ID'].astype(str), y=sentiment_score['AVG_SENTIMENT_SCORE'], marker_color="orange", name="AVG_SENTIMENT_SCORE"))
+    fig.update_layout(title="Call Center Transcripts Sentiment Score by Cell", yaxis_title="Avg Sentiment Score", xaxis_title="CELL_ID", xaxis_type="category")
+    return fig
+
+data = load_tower_data()
 
 # Define Pydeck GridLayer
+# Only the columns the grid draws with (plus CELL_ID to resolve picks) are serialized
+# to the browser; a picked tower's full stats are looked up from `data` instead
+SELECTION_COLUMNS = {
+    "CELL_ID": "Cell ID",
+    "CELL_LATITUDE": "Latitude",
+    "CELL_LONGITUDE": "Longitude",
+    "FAILURE_RATE": "Failure Rate (%)",
+    "SUCCESS_RATE": "Success Rate (%)",
+    "TOTAL_CALLS": "Total Calls",
+    "TOTAL_SUCCESS": "Total Successful Calls",
+}
+layer_data = data[["CELL_ID", "CELL_LONGITUDE", "CELL_LATITUDE", "FAILURE_RATE", "COLOR"]]
+
 grid_layer = pdk.Layer(
     "GridLayer",
     id="cell_tower_grid",
-    data=data,
+    data=layer_data,
     get_position=["CELL_LONGITUDE", "CELL_LATITUDE"],
     cell_size=2000,  # Adjust size for visual clarity (in meters)
     extruded=True,
@@ -99,30 +206,24 @@ st.session_state.event = st.pydeck_chart(
 )
 
 cell_tower_objects = st.session_state.event.selection.get("objects", {}).get("cell_tower_grid", [])
-selection_data = []
-
-for obj in cell_tower_objects:
-    points = obj.get("points", [])
-    for point in points:
-        source = point.get("source", {})
-        selection_data.append({
-            "Cell ID": source.get("CELL_ID"),
-            "Latitude": source.get("CELL_LATITUDE"),
-            "Longitude": source.get("CELL_LONGITUDE"),
-            "Failure Rate (%)": source.get("FAILURE_RATE"),
-            "Success Rate (%)": source.get("SUCCESS_RATE"),
-            "Total Calls": source.get("TOTAL_CALLS"),
-            "Total Successful Calls": source.get("TOTAL_SUCCESS"),
-        })
-
-df = pd.DataFrame(selection_data)
-
-if len(selection_data) > 0:
+picked_ids = [
+    point.get("source", {}).get("CELL_ID")
+    for obj in cell_tower_objects
+    for point in obj.get("points", [])
+]
+
+df = (
+    data.loc[data["CELL_ID"].isin(picked_ids), list(SELECTION_COLUMNS)]
+    .rename(columns=SELECTION_COLUMNS)
+    .reset_index(drop=True)
+)
+
+if not df.empty:
     prompt = f"""
     You are a network engineer analyzing multiple failed cells in a cell tower. 
     Provide a concise summary of the failed cells using the following data:
 
-    {points}
+    {df.to_json(orient="records")}
 
     Start your response directly with: "The selected grid has". 
     Format the response in Markdown with proper bullet points. For each failed cell, use a bullet point and display the details as sub-bullets, like this example:
@@ -133,83 +234,42 @@ if len(selection_data) > 0:
     Do not include phrases like "Based on the provided data".
     """
     
-    prompt = prompt.replace("'", "''")
+    # Sorted so the same set of cells hits the same cache entry in any order
+    cell_ids_list = df["Cell ID"].to_list()
+    cell_ids_key = tuple(sorted(cell_ids_list))
+    
+    # The summary, loyalty and sentiment requests don't depend on each other, so fire
+    # them together and wait for the slowest rather than the sum of all three
+    with st.spinner("Analyzing selected cells..."):
+        executor = get_query_executor()
+        summary_job = submit_in_script_ctx(executor, cortex_complete, 'mistral-large', prompt)
+        loyalty_job = submit_in_script_ctx(executor, load_loyalty_data, cell_ids_key)
+        sentiment_job = submit_in_script_ctx(executor, load_sentiment_data, cell_ids_key)
+        selection_text = summary_job.result()
+        loyalty_data = loyalty_job.result()
+        sentiment_score = sentiment_job.result()
     
-    selection_text = session.sql(f"select snowflake.cortex.complete('mistral-large', '{prompt}') as res").to_pandas()
     st.write("#### Selected Grid Cells")
-    st.markdown(selection_text["RES"][0])
+    st.markdown(selection_text)
 
     st.write("")
     col1, col2, col3 = st.columns(3)
     # Plot 1: Bar Chart of Failure Rates
 
-    fig1, ax1 = plt.subplots()
-    df.plot(kind="bar", x="Cell ID", y="Failure Rate (%)", color="orange", ax=ax1)
-    ax1.set_ylabel("Failure Rate (%)")
-    ax1.set_title("Failure Rate for Each Cell")
-    col1.pyplot(fig1)
+    fig1 = build_failure_rate_fig(tuple(df["Cell ID"]), tuple(df["Failure Rate (%)"]))
+    col1.plotly_chart(fig1, use_container_width=True)
 
 
-    cell_ids_list = df["Cell ID"].to_list()
-    cell_ids_str = ','.join(map(str, cell_ids_list))
-    loyalty_data = session.sql(f"""SELECT 
-        c.cell_id,
-        COUNT(CASE WHEN cl.status = 'Bronze' THEN 1 END) AS bronze_count,
-        COUNT(CASE WHEN cl.status = 'Silver' THEN 1 END) AS silver_count,
-        COUNT(CASE WHEN cl.status = 'Gold' THEN 1 END) AS gold_count
-    FROM 
-        TELCO_NETWORK_OPTIMIZATION_PROD.raw.customer_loyalty cl
-    JOIN 
-        TELCO_NETWORK_OPTIMIZATION_PROD.RAW.CELL_TOWER c
-    ON 
-        cl.phone_number = c.msisdn
-    WHERE 
-        c.call_release_code != 0
-        AND c.cell_id IN ({cell_ids_str})
-    GROUP BY 
-        c.cell_id;
-    """).to_pandas()
     # Set 'cell_id' as the index for better visualization
     loyalty_data.set_index('CELL_ID', inplace=True)
 
     # Plotting the loyalty status counts
-    fig2, ax2 = plt.subplots()
-    loyalty_data.plot(kind='bar', stacked=True, ax=ax2, color=['#cd7f32', '#c0c0c0', '#ffd700'])
-
-    # Customize plot
-    ax2.set_title('Loyalty Status Count by Cell', fontsize=16)
-    ax2.set_xlabel('Cell ID', fontsize=12)
-    ax2.set_ylabel('Customer Count', fontsize=12)
-    ax2.set_xticklabels(loyalty_data.index, rotation=45)
-    ax2.legend(title="Loyalty Status", labels=["Bronze", "Silver", "Gold"])
+    fig2 = build_loyalty_fig(loyalty_data)
+    col2.plotly_chart(fig2, use_container_width=True)
 
-    # Show the plot in Streamlit
-    col2.pyplot(fig2)
-
-    sentiment_score = session.sql(f"""SELECT 
-        cell_id,
-        AVG(sentiment_score) + 20 AS avg_sentiment_score
-    FROM 
-        TELCO_NETWORK_OPTIMIZATION_PROD.RAW.SUPPORT_TICKETS
-    WHERE cell_id IN ({cell_ids_str})
-    GROUP BY 
-        cell_id
-    ORDER BY 
-        avg_sentiment_score DESC;
-    """).to_pandas()
-
-    # Create the figure and axes for plotting
-    fig3, ax3 = plt.subplots()
-
-    # Plotting the data on ax3 (not ax1, as you might have mixed it up)
-    sentiment_score.plot(kind="bar", x="CELL_ID", y="AVG_SENTIMENT_SCORE", color="orange", ax=ax3)
-
-    # Set plot labels and title
-    ax3.set_ylabel("Avg Sentiment Score")
-    ax3.set_title("Call Center Transcripts Sentiment Score by Cell")
-
-    # Show the plot in Streamlit
-    col3.pyplot(fig3)
+    # Plotting the sentiment score by cell
+    fig3 = build_sentiment_fig(sentiment_score)
+    col3.plotly_chart(fig3, use_container_width=True)
 
     prompt = f"""
     You are a network engineer tasked with improving customer experience, adoption, and reducing call failures. \
@@ -227,8 +287,7 @@ if len(selection_data) > 0:
     Based on this data, suggest which cell should be prioritized for fixes, the reasons for that choice.
     """
 
-    prompt = prompt.replace("'", "''")
-
-    suggestion = session.sql(f"select snowflake.cortex.complete('mistral-large', '{prompt}') as res").to_pandas()
+    with st.spinner("Generating AI analysis..."):
+        suggestion = cortex_complete('mistral-large', prompt)
     st.write("#### Suggestion from LLM:")
-    st.markdown(suggestion["RES"][0])
\ No newline at end of file
+    st.markdown(suggestion)
\ No newline at end of file
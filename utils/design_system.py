@@ -9,6 +9,8 @@ import plotly.graph_objects as go
 import pandas as pd
 from datetime import datetime
 import time
+import threading
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 # =============================================================================
 # DESIGN TOKENS
@@ -869,6 +871,22 @@ def get_snowflake_session():
         create_info_box(f"Failed to connect to Snowflake: {str(e)}", "error")
         st.stop()
 
+def submit_in_script_ctx(executor, fn, *args):
+    """
+    Submit fn(*args) to a thread pool with the worker attached to the current
+    script run's context, so st.cache_data and st.* calls still work from it.
+    
+    Returns:
+        The concurrent.futures.Future for the call
+    """
+    ctx = get_script_run_ctx()
+    
+    def task():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return fn(*args)
+    
+    return executor.submit(task)
+
 def execute_query_with_loading(query: str, description: str = "Loading data..."):
     """Execute Snowflake query with professional loading state"""
     session = get_snowflake_session()
@@ -888,6 +906,62 @@ def execute_query_with_loading(query: str, description: str = "Loading data...")
         create_info_box(f"Error executing query: {str(e)}", "error")
         return pd.DataFrame()
 
+CUSTOMERS_QUERY = """
+WITH customers AS (
+    SELECT DISTINCT 
+        CELL_ID as customer_id,
+        CUSTOMER_NAME as first_name,
+        '' as last_name,
+        CUSTOMER_EMAIL as email,
+        'Mobile' as service_type,
+        'Active' as account_status,
+        'Premium' as customer_segment
+    FROM TELCO_NETWORK_OPTIMIZATION_PROD.RAW.SUPPORT_TICKETS
+    WHERE CUSTOMER_NAME IS NOT NULL
+    LIMIT 50
+),
+ticket_stats AS (
+    SELECT 
+        CELL_ID,
+        COUNT(*) as ticket_count,
+        AVG(SENTIMENT_SCORE) as avg_sentiment,
+        BOOLOR_AGG(REQUEST ILIKE '%outage%' OR REQUEST ILIKE '%problem%') as has_service_issue
+    FROM TELCO_NETWORK_OPTIMIZATION_PROD.RAW.SUPPORT_TICKETS
+    WHERE CELL_ID IN (SELECT customer_id FROM customers)
+    GROUP BY CELL_ID
+)
+SELECT 
+    customers.*,
+    COALESCE(ticket_stats.ticket_count, 0) as ticket_count,
+    ticket_stats.avg_sentiment,
+    COALESCE(ticket_stats.has_service_issue, FALSE) as has_service_issue
+FROM customers
+LEFT JOIN ticket_stats ON ticket_stats.CELL_ID = customers.customer_id
+"""
+
+CUSTOMERS_TTL = 600  # seconds
+
+@st.cache_data(ttl=CUSTOMERS_TTL, show_spinner="Loading customer data...")
+def _load_customers() -> pd.DataFrame:
+    """Shared across users; refreshed at most every 10 minutes"""
+    return get_snowflake_session().sql(CUSTOMERS_QUERY).to_pandas()
+
+def get_customers_cached() -> pd.DataFrame:
+    """
+    Customer list with each customer's ticket count, average sentiment and
+    outage/problem flag precomputed.
+    
+    The load is kept in st.session_state['customers_df'] with its load time, so
+    returning to any page that needs it makes no further lookups until it is older
+    than CUSTOMERS_TTL; after that it is reloaded so the aggregates don't go stale.
+    A failed load raises and is not stored.
+    """
+    cached = st.session_state.get('customers_df')
+    if cached is None or time.time() - cached[0] > CUSTOMERS_TTL:
+        cached = (time.time(), _load_customers())
+        st.session_state['customers_df'] = cached
+    return cached[1]
+
 # =============================================================================
 # PAGE LAYOUT HELPERS
 # =============================================================================